@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Cache simples em disco com TTL para respostas de fontes externas
+Evita re-consultar yfinance/Status Invest quando os dados ainda são recentes
+"""
+import json
+import time
+import pathlib
+
+
+class FileCache:
+    """Guarda dicts como JSON em {cache_dir}/{fonte}/{chave}.json com carimbo de tempo
+
+    Registro no formato {'ts': epoch, 'data': {...}}; entradas mais velhas
+    que o TTL são tratadas como ausentes. Erros de disco nunca propagam -
+    cache é aceleração, não pré-requisito.
+    """
+
+    def __init__(self, cache_dir: str = '.cache', ttl_seconds: float = 21600):
+        self.dir = pathlib.Path(cache_dir)
+        self.ttl = ttl_seconds
+
+    def _caminho(self, fonte: str, chave: str) -> pathlib.Path:
+        return self.dir / fonte / f"{chave.lower()}.json"
+
+    def get(self, fonte: str, chave: str):
+        """Retorna os dados cacheados ou None se ausentes/expirados"""
+        try:
+            registro = json.loads(self._caminho(fonte, chave).read_text(encoding='utf-8'))
+            if time.time() - registro['ts'] <= self.ttl:
+                return registro['data']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def set(self, fonte: str, chave: str, dados):
+        """Grava os dados com o timestamp atual (falha silenciosa)"""
+        caminho = self._caminho(fonte, chave)
+        try:
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            caminho.write_text(
+                json.dumps({'ts': time.time(), 'data': dados}, ensure_ascii=False),
+                encoding='utf-8'
+            )
+        except OSError:
+            pass
@@ -7,123 +7,573 @@ import os
 import json
 import time
 import random
+import re
 import sys
-from datetime import datetime
+import asyncio
+import pathlib
+import logging
+import threading
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 import requests
+from urllib3.util.retry import Retry
 import yfinance as yf
-from bs4 import BeautifulSoup
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
+from bs4 import BeautifulSoup, SoupStrainer
+
+from cache import FileCache
+
+
+log = logging.getLogger('screener')
+
+try:
+    import aiohttp  # Opcional: habilita coleta concorrente do Status Invest
+except ImportError:
+    aiohttp = None
+
+try:
+    from lxml import etree, html as lxml_html  # parser C ~10x mais rápido que o html.parser puro-Python
+    PARSER_HTML = 'lxml'
+    # XPaths compilados uma única vez para o parse do Status Invest
+    XPATH_ITENS = etree.XPath("//div[contains(concat(' ', normalize-space(@class), ' '), ' item ')]")
+    XPATH_VALOR = etree.XPath(".//strong[contains(concat(' ', normalize-space(@class), ' '), ' value ')]//text()")
+except ImportError:
+    PARSER_HTML = 'html.parser'
+    lxml_html = None
+
+try:
+    import orjson  # Opcional: serialização JSON em Rust, lida com NumPy/NaN nativamente
+except ImportError:
+    orjson = None
+
+
+# Lista validada de tickers que funcionam no yfinance (com sufixo .SA)
+TICKERS_VALIDOS = (
+    'PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA', 'BBAS3.SA',
+    'ABEV3.SA', 'WEGE3.SA', 'TAEE11.SA', 'BBSE3.SA', 'HYPE3.SA',
+    'RENT3.SA', 'LREN3.SA', 'CIEL3.SA', 'GGBR4.SA', 'EMBR3.SA',
+    'VIIA3.SA', 'B3SA3.SA', 'SULA11.SA', 'UGPA3.SA', 'ENGI11.SA',
+    'ENEV3.SA', 'EQTL3.SA', 'EGIE3.SA', 'YDUQ3.SA', 'NTCO3.SA', 'PCAR3.SA'
+)
+
+
+class TokenBucket:
+    """Limitador de vazão thread-safe: rajada limitada + recarga a taxa constante
+
+    Substitui os sleeps aleatórios entre requisições - o espaçamento vira
+    determinístico e o tempo só é gasto quando a cota realmente acabou.
+    """
+
+    def __init__(self, taxa: float, capacidade: int = 1):
+        self.taxa = max(taxa, 0.001)  # tokens por segundo
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloqueia até haver um token disponível"""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+
+def _score_kernel(pl, pvp, dy, roe, div):
+    """Kernel de score sobre arrays float64 (NaN = métrica ausente, recebe bônus parcial)
+
+    Função pura de arrays -> array, separada da classe de propósito: se o
+    universo crescer para centenas de papéis, é este kernel que um
+    numba.njit decoraria sem mexer no resto do fluxo.
+    """
+    score = np.zeros(len(pl))
+    # P/L (20 pontos)
+    score += np.where(np.isnan(pl), 10.0,
+                      np.where((pl > 0) & (pl <= 15), 20 * (1 - np.minimum(pl / 15, 1)), 0.0))
+    # P/VP (20 pontos)
+    score += np.where(np.isnan(pvp), 10.0,
+                      np.where((pvp > 0) & (pvp <= 1.5), 20 * (1 - np.minimum(pvp / 1.5, 1)), 0.0))
+    # DY (25 pontos)
+    score += np.where(np.isnan(dy), 12.5,
+                      np.where(dy >= 4.0, 25 * np.minimum(dy / 4.0, 2.0), 0.0))
+    # ROE (25 pontos)
+    score += np.where(np.isnan(roe), 12.5,
+                      np.where(roe >= 12.0, 25 * np.minimum(roe / 12.0, 2.0), 0.0))
+    # Dívida (10 pontos) - dados aproximados
+    score += np.where(np.isnan(div), 5.0,
+                      np.where(div <= 3.0, 10 * (1 - np.minimum(div / 3.0, 1)), 0.0))
+    return score
+
+
+HEADERS_HTTP = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Connection": "keep-alive",
+    "Referer": "https://www.google.com/",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Upgrade-Insecure-Requests": "1"
+}
 
 
 class ScreenerResilienteBR:
     """Coleta dados reais com fallback robusto contra bloqueios"""
-    
+
+    # Sem __dict__ por instância: atributos fixos, acesso mais barato
+    __slots__ = ('rate_limit', 'concorrencia', 'max_tentativas', 'session', 'cache_dir', 'cache',
+                 '_yf_tickers', '_bucket_yf', '_bucket_si', '_ignorar_cache',
+                 'status_invest_habilitado')
+
+    # Mapeamento campo -> chaves do yfinance em ordem de preferência,
+    # construído uma única vez em vez de cadeias de .get() por chamada
+    CAMPOS_YFINANCE = {
+        'preco': ('currentPrice', 'regularMarketPrice', 'previousClose'),
+        'pl': ('trailingPE',),
+        'pvp': ('priceToBook',),
+        'dy': ('dividendYield', 'trailingAnnualDividendYield'),
+        'roe': ('returnOnEquity',),
+        'roic': ('returnOnAssets',),  # ROIC aproximado
+        'volume': ('averageVolume',),
+        'market_cap': ('marketCap',),
+        'dividend_rate': ('dividendRate',),
+        'payout_ratio': ('payoutRatio',),
+    }
+    # Campos que o yfinance entrega como fração e reportamos em %
+    CAMPOS_PERCENTUAIS = frozenset({'dy', 'roe', 'roic', 'payout_ratio'})
+    # Campos onde zero conta como ausente (comportamento original dos encadeamentos
+    # com 'or' e dos '* 100 if x'); nos demais, 0.0 é valor legítimo e só None é ausência
+    CAMPOS_FALLBACK_TRUTHY = frozenset({'preco'}) | CAMPOS_PERCENTUAIS
+
+    # Endpoint JSON que alimenta a página /acoes/<ticker> - payload ~10x menor que o HTML
+    URL_INDICADORES_JSON = 'https://statusinvest.com.br/acao/indicatorhistoricallist'
+
+    # Número pt-BR: captura '1.234,56', '12,3' e também '12.5', ignorando '%' e espaços ao redor
+    _RE_NUMERO = re.compile(r'-?\d{1,3}(?:\.\d{3})+(?:,\d+)?|-?\d+(?:[.,]\d+)?')
+    # Token agrupado em milhares sem vírgula decimal (ex: '1.234', '1.234.567')
+    _RE_MILHARES = re.compile(r'-?\d{1,3}(?:\.\d{3})+')
+    # Tabela de tradução aplicada em C num único passe: descarta o separador
+    # de milhar e troca a vírgula decimal por ponto
+    _TRADUZ_NUMERO = str.maketrans({'.': None, ',': '.'})
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _converter_valor(texto: str):
+        """Converte texto numérico pt-BR (ex: '1.234,56%') para float, ou None se não houver número"""
+        m = ScreenerResilienteBR._RE_NUMERO.search(texto)
+        if not m:
+            return None
+        token = m.group()
+        # Normalizar também quando há só milhares ('1.234' -> 1234.0); um único
+        # ponto sem agrupamento ('12.5') segue como decimal
+        if ',' in token or ScreenerResilienteBR._RE_MILHARES.fullmatch(token):
+            token = token.translate(ScreenerResilienteBR._TRADUZ_NUMERO)
+        return float(token)
+
     def __init__(self):
-        # Lista validada de tickers que funcionam no yfinance (com sufixo .SA)
-        self.tickers_validos = [
-            'PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA', 'BBAS3.SA', 
-            'ABEV3.SA', 'WEGE3.SA', 'TAEE11.SA', 'BBSE3.SA', 'HYPE3.SA',
-            'RENT3.SA', 'LREN3.SA', 'CIEL3.SA', 'GGBR4.SA', 'EMBR3.SA',
-            'VIIA3.SA', 'B3SA3.SA', 'SULA11.SA', 'UGPA3.SA', 'ENGI11.SA',
-            'ENEV3.SA', 'EQTL3.SA', 'EGIE3.SA', 'YDUQ3.SA', 'NTCO3.SA', 'PCAR3.SA'
-        ]
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Connection": "keep-alive",
-            "Referer": "https://www.google.com/",
-            "Sec-Fetch-Dest": "document",
-            "Sec-Fetch-Mode": "navigate",
-            "Sec-Fetch-Site": "none",
-            "Sec-Fetch-User": "?1",
-            "Upgrade-Insecure-Requests": "1"
-        }
         self.rate_limit = float(os.getenv('FUNDAMENTUS_RATE_LIMIT', '4.0'))  # Aumentado para 4s
-    
+        self.concorrencia = int(os.getenv('STATUS_INVEST_CONCORRENCIA', '8'))
+        self.max_tentativas = int(os.getenv('STATUS_INVEST_TENTATIVAS', '3'))
+
+        # Detectado uma única vez: em GitHub Actions o Status Invest é código morto
+        # (IPs de datacenter são bloqueados), então nem entramos no caminho de coleta
+        self.status_invest_habilitado = 'GITHUB_ACTIONS' not in os.environ
+
+        # Session com pool de conexões: reaproveita o handshake TCP+TLS entre requisições.
+        # Retry do urllib3 cuida de 429/5xx com backoff exponencial e respeita
+        # Retry-After, em vez de perder o ticker na primeira falha transitória.
+        retry = Retry(
+            total=self.max_tentativas,
+            backoff_factor=1.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
+        )
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS_HTTP)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=4, pool_maxsize=self.concorrencia, max_retries=retry
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Cache em disco com dois níveis (HTML bruto + dados parseados), chaveado por ticker+dia.
+        # Re-execuções no mesmo dia (ex: retry após falha no Sheets) não tocam a rede.
+        self.cache_dir = pathlib.Path(os.getenv('FUNDAMENTUS_CACHE', '.cache/fundamentus'))
+        (self.cache_dir / 'parsed').mkdir(parents=True, exist_ok=True)
+
+        # Cache com TTL para os dados do yfinance (re-execuções no intervalo não tocam a rede);
+        # FORCE_REFRESH=1 ignora as entradas existentes sem apagá-las
+        self.cache = FileCache(ttl_seconds=float(os.getenv('FUNDAMENTUS_CACHE_TTL', '21600')))
+        self._ignorar_cache = os.getenv('FORCE_REFRESH') == '1'
+
+        # Instâncias de yf.Ticker reaproveitadas (cada uma monta sessão própria ao ser criada)
+        self._yf_tickers = {}
+
+        # Buckets de vazão: espaçamento determinístico em vez de sleeps aleatórios
+        self._bucket_yf = TokenBucket(taxa=float(os.getenv('YFINANCE_QPS', '5.0')), capacidade=4)
+        self._bucket_si = TokenBucket(taxa=1.0 / max(self.rate_limit, 0.1))
+
+    def _yf_ticker(self, ticker: str):
+        """Retorna a instância de yf.Ticker do papel, criando-a só na primeira vez"""
+        acao = self._yf_tickers.get(ticker)
+        if acao is None:
+            acao = self._yf_tickers[ticker] = yf.Ticker(ticker)
+        return acao
+
+    def _caminhos_cache(self, ticker: str) -> tuple:
+        """Retorna os caminhos (html, parsed) do cache diário de um ticker"""
+        nome = f"{ticker.replace('.SA', '').lower()}_{date.today().isoformat()}"
+        return self.cache_dir / f"{nome}.html", self.cache_dir / 'parsed' / f"{nome}.json"
+
+    def _ler_cache(self, ticker: str) -> tuple:
+        """Lê o cache do dia: (dados parseados ou None, HTML bruto ou None)"""
+        caminho_html, caminho_parsed = self._caminhos_cache(ticker)
+        if caminho_parsed.exists():
+            try:
+                return json.loads(caminho_parsed.read_text(encoding='utf-8')), None
+            except (ValueError, OSError):
+                pass
+        if caminho_html.exists():
+            try:
+                return None, caminho_html.read_bytes()
+            except OSError:
+                pass
+        return None, None
+
+    def _caminhos_validadores(self, ticker: str) -> tuple:
+        """Caminhos (etag, último HTML) usados no GET condicional - sem data, valem entre dias"""
+        nome = ticker.replace('.SA', '').lower()
+        return self.cache_dir / f"{nome}.etag", self.cache_dir / f"{nome}_ultimo.html"
+
+    def _cabecalhos_condicionais(self, ticker: str) -> dict:
+        """Monta If-None-Match quando temos ETag e cópia do último HTML"""
+        caminho_etag, caminho_ultimo = self._caminhos_validadores(ticker)
+        if caminho_etag.exists() and caminho_ultimo.exists():
+            try:
+                return {'If-None-Match': caminho_etag.read_text(encoding='utf-8').strip()}
+            except OSError:
+                pass
+        return {}
+
+    def _guardar_validadores(self, ticker: str, etag: str, html: bytes):
+        """Guarda o ETag e o HTML correspondente para revalidação futura (falha silenciosa)"""
+        if not etag:
+            return
+        caminho_etag, caminho_ultimo = self._caminhos_validadores(ticker)
+        try:
+            caminho_etag.write_text(etag, encoding='utf-8')
+            caminho_ultimo.write_bytes(html)
+        except OSError:
+            pass
+
+    def _html_nao_modificado(self, ticker: str) -> bytes:
+        """Recupera o último HTML conhecido após um 304, ou None se indisponível"""
+        try:
+            return self._caminhos_validadores(ticker)[1].read_bytes()
+        except OSError:
+            return None
+
+    def _gravar_cache(self, ticker: str, html: bytes = None, dados: dict = None):
+        """Grava HTML bruto e/ou dados parseados no cache do dia (falha silenciosa)"""
+        caminho_html, caminho_parsed = self._caminhos_cache(ticker)
+        try:
+            if html is not None:
+                caminho_html.write_bytes(html)
+            if dados is not None:
+                caminho_parsed.write_text(json.dumps(dados, ensure_ascii=False), encoding='utf-8')
+        except OSError:
+            pass
+
+    # Só os blocos de indicadores (div.item) interessam; o filtro evita montar o DOM da página inteira
+    _FILTRO_INDICADORES = SoupStrainer('div', class_='item')
+
+    def _parsear_status_invest(self, html: bytes) -> dict:
+        """Extrai indicadores do HTML do Status Invest (compartilhado pelos caminhos sync e async)
+
+        Caminho principal via lxml + XPath compilado; BeautifulSoup fica como
+        fallback quando o lxml não está instalado.
+        """
+        # Extrair ROE (exemplo simplificado - adaptar conforme estrutura atual do site)
+        roe = None
+        if lxml_html is not None:
+            try:
+                arvore = lxml_html.fromstring(html)
+            except etree.ParserError:
+                return {}
+            for item in XPATH_ITENS(arvore):
+                if 'ROE' in ' '.join(item.itertext()).upper():
+                    valores = XPATH_VALOR(item)
+                    if valores:
+                        roe = self._converter_valor(valores[0])
+                    break
+            return {'roe': roe} if roe else {}
+
+        soup = BeautifulSoup(html, PARSER_HTML, parse_only=self._FILTRO_INDICADORES)
+        for item in soup.select('div.item'):
+            if 'ROE' in item.get_text(' ', strip=True).upper():
+                valor_elem = item.select_one('strong.value')
+                if valor_elem:
+                    roe = self._converter_valor(valor_elem.text)
+                break
+
+        return {'roe': roe} if roe else {}
+
     def coletar_yfinance_completo(self, ticker: str) -> dict:
         """Coleta dados completos via yfinance (fonte primária confiável)"""
+        if not self._ignorar_cache:
+            cached = self.cache.get('yf', ticker)
+            if cached is not None:
+                return cached
+
         try:
-            acao = yf.Ticker(ticker)
+            acao = self._yf_ticker(ticker)
             info = acao.info
-            
-            # Extrair métricas com fallbacks
-            preco = info.get('currentPrice') or info.get('regularMarketPrice') or info.get('previousClose')
-            dy = info.get('dividendYield')
-            if dy is None and info.get('trailingAnnualDividendYield'):
-                dy = info.get('trailingAnnualDividendYield')
-            dy = dy * 100 if dy else None
-            
-            dados = {
-                'ticker': ticker.replace('.SA', ''),
-                'preco': preco,
-                'pl': info.get('trailingPE'),
-                'pvp': info.get('priceToBook'),
-                'dy': dy,
-                'roe': info.get('returnOnEquity') * 100 if info.get('returnOnEquity') else None,
-                'roic': info.get('returnOnAssets') * 100 if info.get('returnOnAssets') else None,  # ROIC aproximado
-                'volume': info.get('averageVolume'),
-                'market_cap': info.get('marketCap'),
-                'dividend_rate': info.get('dividendRate'),
-                'payout_ratio': info.get('payoutRatio') * 100 if info.get('payoutRatio') else None
-            }
-            
+
+            # Extrair métricas com fallbacks via mapeamento pré-construído;
+            # map(info.get, ...) resolve os aliases em C, um lookup por chave
+            dados = {'ticker': ticker.replace('.SA', '')}
+            info_get = info.get
+            for campo, chaves in self.CAMPOS_YFINANCE.items():
+                if campo in self.CAMPOS_FALLBACK_TRUTHY:
+                    valor = next(filter(None, map(info_get, chaves)), None)
+                    if valor and campo in self.CAMPOS_PERCENTUAIS:
+                        valor *= 100
+                else:
+                    valor = next((v for v in map(info_get, chaves) if v is not None), None)
+                dados[campo] = valor
+
             # Calcular dívida líquida/EBITDA aproximado (não disponível diretamente no yfinance)
             # Fallback: usar debtToEquity se disponível
             if info.get('debtToEquity'):
                 dados['div_liq_ebitda'] = info['debtToEquity'] / 100  # Conversão aproximada
-            
+
+            self.cache.set('yf', ticker, dados)
             return dados
-            
+
         except Exception as e:
-            print(f"  ⚠️ yfinance {ticker}: {str(e)[:50]}")
-            return {'ticker': ticker.replace('.SA', '')}
+            log.warning("  ⚠️ yfinance %s: %s", ticker, str(e)[:50])
+            # .info quebra com frequência nas trocas de API do Yahoo; fast_info é um
+            # endpoint bem mais leve e estável que ainda garante preço/volume
+            try:
+                rapido = self._yf_ticker(ticker).fast_info
+                dados = {
+                    'ticker': ticker.replace('.SA', ''),
+                    'preco': rapido.last_price,
+                    'volume': rapido.three_month_average_volume,
+                    'market_cap': rapido.market_cap,
+                }
+                self.cache.set('yf', ticker, dados)
+                return dados
+            except Exception:
+                return {'ticker': ticker.replace('.SA', '')}
     
+    def _buscar_indicadores_json(self, ticker: str) -> dict:
+        """Tenta o endpoint JSON do Status Invest; {} devolve o chamador ao scraping de HTML"""
+        ticker_sem_sa = ticker.replace('.SA', '').lower()
+        try:
+            response = self.session.get(
+                self.URL_INDICADORES_JSON,
+                params={'codes[]': ticker_sem_sa, 'time': 5, 'byQuarter': False, 'futureData': False},
+                headers={'X-Requested-With': 'XMLHttpRequest'},
+                timeout=8,
+            )
+            if response.status_code != 200:
+                return {}
+            payload = response.json()
+            # Formato observado: {'data': {'<ticker>': [{'key': 'roe', 'actual': 12.3, ...}, ...]}}
+            for item in payload.get('data', {}).get(ticker_sem_sa, []):
+                if str(item.get('key', '')).lower() == 'roe':
+                    roe = item.get('actual')
+                    if roe is not None:
+                        return {'roe': float(roe)}
+            return {}
+        except (requests.RequestException, ValueError, TypeError):
+            return {}
+
     def tentar_status_invest(self, ticker: str) -> dict:
         """Tenta coletar dados do Status Invest (opcional - não falha se bloqueado)"""
         try:
             ticker_sem_sa = ticker.replace('.SA', '').lower()
             url = f"https://statusinvest.com.br/acoes/{ticker_sem_sa}"
             
-            # Apenas tentar se não estiver em ambiente GitHub Actions (evita desperdício de tempo)
-            if 'GITHUB_ACTIONS' in os.environ:
-                print(f"  🌐 {ticker_sem_sa:6}... ⏸️  Skip Status Invest (GitHub Actions)")
+            # Cache do dia evita refetch e reparse em re-execuções
+            dados_cache, html_cache = self._ler_cache(ticker)
+            if dados_cache is not None:
+                log.info("  🌐 %-6s... 💾 Cache", ticker_sem_sa)
+                return dados_cache
+            if html_cache is not None:
+                dados = self._parsear_status_invest(html_cache)
+                self._gravar_cache(ticker, dados=dados)
+                log.info("  🌐 %-6s... 💾 Cache (HTML)", ticker_sem_sa)
+                return dados
+
+            # Primeiro o endpoint JSON: sem HTML para baixar nem parsear
+            dados = self._buscar_indicadores_json(ticker)
+            if dados:
+                self._gravar_cache(ticker, dados=dados)
+                log.info("  🌐 %-6s... ✅ ROE: %.1f%% (JSON)", ticker_sem_sa, dados['roe'])
+                return dados
+
+            # Requisição com timeout curto (evita travar execução);
+            # If-None-Match deixa o servidor responder 304 sem corpo quando nada mudou
+            response = self.session.get(url, timeout=8, headers=self._cabecalhos_condicionais(ticker))
+
+            if response.status_code == 304:
+                html = self._html_nao_modificado(ticker)
+                if html is not None:
+                    dados = self._parsear_status_invest(html)
+                    self._gravar_cache(ticker, dados=dados)
+                    log.info("  🌐 %-6s... 🔁 304 (não modificado)", ticker_sem_sa)
+                    return dados
                 return {}
-            
-            print(f"  🌐 {ticker_sem_sa:6}...", end=' ', flush=True)
-            
-            # Requisição com timeout curto (evita travar execução)
-            response = requests.get(url, headers=self.headers, timeout=8)
-            
+
             if response.status_code == 403:
-                print("🔒 Bloqueado")
+                log.info("  🌐 %-6s... 🔒 Bloqueado", ticker_sem_sa)
                 return {}
             elif response.status_code != 200:
-                print(f"⚠️ {response.status_code}")
+                log.info("  🌐 %-6s... ⚠️ %s", ticker_sem_sa, response.status_code)
                 return {}
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extrair ROE (exemplo simplificado - adaptar conforme estrutura atual do site)
-            roe = None
-            roe_elem = soup.find('div', class_='item', string=lambda x: x and 'ROE' in x.upper())
-            if roe_elem:
-                valor_elem = roe_elem.find_next('strong', class_='value')
-                if valor_elem:
-                    try:
-                        roe = float(valor_elem.text.strip().replace('%', '').replace(',', '.'))
-                    except:
-                        pass
-            
-            print(f"✅ ROE: {roe:.1f}%" if roe else "✅ Parcial")
-            return {'roe': roe} if roe else {}
-            
+
+            self._gravar_cache(ticker, html=response.content)
+            self._guardar_validadores(ticker, response.headers.get('ETag'), response.content)
+            dados = self._parsear_status_invest(response.content)
+            self._gravar_cache(ticker, dados=dados)
+            roe = dados.get('roe')
+            if roe:
+                log.info("  🌐 %-6s... ✅ ROE: %.1f%%", ticker_sem_sa, roe)
+            else:
+                log.info("  🌐 %-6s... ✅ Parcial", ticker_sem_sa)
+            return dados
+
         except Exception as e:
             # Não falhar - Status Invest é opcional
             return {}
+
+    async def _buscar_status_invest_async(self, session, semaforo, ticker: str) -> tuple:
+        """Busca uma página do Status Invest dentro do semáforo (versão async de tentar_status_invest)"""
+        ticker_sem_sa = ticker.replace('.SA', '').lower()
+        url = f"https://statusinvest.com.br/acoes/{ticker_sem_sa}"
+
+        try:
+            # Cache do dia evita refetch e reparse em re-execuções
+            dados_cache, html_cache = self._ler_cache(ticker)
+            if dados_cache is not None:
+                log.info("  🌐 %-6s... 💾 Cache", ticker_sem_sa)
+                return ticker, dados_cache
+            if html_cache is not None:
+                loop = asyncio.get_running_loop()
+                dados = await loop.run_in_executor(None, self._parsear_status_invest, html_cache)
+                self._gravar_cache(ticker, dados=dados)
+                log.info("  🌐 %-6s... 💾 Cache (HTML)", ticker_sem_sa)
+                return ticker, dados
+
+            # Endpoint JSON primeiro, como no caminho sequencial: a chamada usa a
+            # Session sync (com Retry), então roda no executor sob o mesmo ritmo
+            # do semáforo para não furar o rate limit agregado
+            async with semaforo:
+                await asyncio.sleep(self.rate_limit / max(self.concorrencia, 1))
+                loop = asyncio.get_running_loop()
+                dados = await loop.run_in_executor(None, self._buscar_indicadores_json, ticker)
+            if dados:
+                self._gravar_cache(ticker, dados=dados)
+                log.info("  🌐 %-6s... ✅ ROE: %.1f%% (JSON)", ticker_sem_sa, dados['roe'])
+                return ticker, dados
+
+            html = None
+            etag = None
+            condicionais = self._cabecalhos_condicionais(ticker)
+            for tentativa in range(self.max_tentativas):
+                if tentativa:
+                    # Backoff exponencial com jitter antes de tentar de novo (429/5xx/timeout)
+                    await asyncio.sleep(2 ** tentativa + random.uniform(0, 1))
+                try:
+                    async with semaforo:
+                        # Espaçar requisições dentro do semáforo preserva o QPS agregado do rate limit
+                        await asyncio.sleep(self.rate_limit / max(self.concorrencia, 1))
+                        async with session.get(url, timeout=aiohttp.ClientTimeout(total=8),
+                                               headers=condicionais) as response:
+                            if response.status == 200:
+                                html = await response.read()
+                                etag = response.headers.get('ETag')
+                                break
+                            if response.status == 304:
+                                # Nada mudou desde a última coleta: reusa o HTML guardado
+                                html = self._html_nao_modificado(ticker)
+                                if html is not None:
+                                    break
+                                return ticker, {}
+                            if response.status == 403:
+                                log.info("  🌐 %-6s... 🔒 Bloqueado", ticker_sem_sa)
+                                return ticker, {}
+                            # 429/5xx: vale a pena tentar de novo
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+
+            if html is None:
+                log.info("  🌐 %-6s... ⚠️ Sem resposta após %d tentativas", ticker_sem_sa, self.max_tentativas)
+                return ticker, {}
+
+            self._gravar_cache(ticker, html=html)
+            self._guardar_validadores(ticker, etag, html)
+
+            # Parsing do BS4 fora do event loop para não travar as outras requisições
+            loop = asyncio.get_running_loop()
+            dados = await loop.run_in_executor(None, self._parsear_status_invest, html)
+            self._gravar_cache(ticker, dados=dados)
+            roe = dados.get('roe')
+            if roe:
+                log.info("  🌐 %-6s... ✅ ROE: %.1f%%", ticker_sem_sa, roe)
+            else:
+                log.info("  🌐 %-6s... ✅ Parcial", ticker_sem_sa)
+            return ticker, dados
+
+        except Exception:
+            # Não falhar - Status Invest é opcional
+            return ticker, {}
+
+    async def _enriquecer_async(self, tickers: list) -> dict:
+        """Dispara todas as buscas do Status Invest concorrentemente com limite por host"""
+        semaforo = asyncio.Semaphore(self.concorrencia)
+        connector = aiohttp.TCPConnector(limit_per_host=self.concorrencia)
+        async with aiohttp.ClientSession(connector=connector, headers=HEADERS_HTTP) as session:
+            resultados = await asyncio.gather(
+                *[self._buscar_status_invest_async(session, semaforo, t) for t in tickers]
+            )
+        return {ticker: dados for ticker, dados in resultados if dados}
+
+    def enriquecer_status_invest(self, tickers: list) -> dict:
+        """Enriquece tickers com Status Invest - concorrente via aiohttp, sequencial como fallback"""
+        if not tickers:
+            return {}
+
+        # Apenas tentar se não estiver em ambiente GitHub Actions (evita desperdício de tempo)
+        if not self.status_invest_habilitado:
+            log.info("  ⏸️  Skip Status Invest para %d tickers (GitHub Actions)", len(tickers))
+            return {}
+
+        if aiohttp is not None:
+            return asyncio.run(self._enriquecer_async(tickers))
+
+        # Fallback sequencial quando aiohttp não está instalado
+        extras = {}
+        for ticker in tickers:
+            self._bucket_si.adquirir()
+            dados = self.tentar_status_invest(ticker)
+            if dados:
+                extras[ticker] = dados
+        return extras
     
     def calcular_score(self, dados: dict) -> float:
         """Calcula score com dados parciais (não requer todas as métricas)"""
@@ -166,7 +616,29 @@ class ScreenerResilienteBR:
         
         return min(score, 100.0)
     
-    def classificar(self, score: float) -> str:
+    def calcular_scores(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calcula score e classificação do DataFrame inteiro de uma vez (NumPy vetorizado)
+
+        Mesmas regras de calcular_score, mas avaliadas coluna a coluna em vez
+        de ticker a ticker - métricas ausentes (NaN) recebem o bônus parcial.
+        """
+        def coluna(nome):
+            serie = df.get(nome, pd.Series(index=df.index, dtype=float))
+            return pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float)
+
+        score = _score_kernel(*(coluna(c) for c in ('pl', 'pvp', 'dy', 'roe', 'div_liq_ebitda')))
+
+        df['score_final'] = np.minimum(score, 100.0)
+        df['classificacao'] = np.select(
+            [score >= 80, score >= 60, score >= 40],
+            ['EXCELENTE', 'BOM', 'ACEITÁVEL'],
+            'ESPECULATIVO'
+        )
+        return df
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def classificar(score: float) -> str:
         if score >= 80:
             return 'EXCELENTE'
         elif score >= 60:
@@ -185,43 +657,67 @@ class ScreenerResilienteBR:
         print(f"🌐 Fonte secundária: Status Invest (opcional, fallback automático)")
         print(f"⏳ Rate limit: {self.rate_limit}s (proteção contra bloqueios)")
         print("="*70)
-        print(f"\n🔍 Analisando {len(self.tickers_validos)} tickers...\n")
-        
-        resultados = []
-        coletados = 0
+        print(f"\n🔍 Analisando {len(TICKERS_VALIDOS)} tickers...\n")
         
-        for i, ticker in enumerate(self.tickers_validos, 1):
-            ticker_limpo = ticker.replace('.SA', '')
-            print(f"[{i:2d}/{len(self.tickers_validos)}] {ticker_limpo:6}", end=' ')
-            
-            # Passo 1: Coletar dados PRIMÁRIOS do yfinance (sempre funciona)
+        # Pré-cria todas as instâncias de Ticker em lote: yf.Tickers compartilha
+        # uma única sessão HTTP entre elas em vez de montar uma por papel
+        try:
+            self._yf_tickers.update(yf.Tickers(' '.join(TICKERS_VALIDOS)).tickers)
+        except Exception as e:
+            log.warning("  ⚠️ yf.Tickers em lote indisponível: %s", str(e)[:50])
+
+        # Passo 1: Coletar dados PRIMÁRIOS do yfinance em paralelo (I/O-bound, GIL liberado no socket)
+        def coletar(ticker):
+            self._bucket_yf.adquirir()  # espaçamento determinístico entre requisições do pool
             dados = self.coletar_yfinance_completo(ticker)
-            
-            # Passo 2: Tentar enriquecer com Status Invest (opcional - não falha)
-            if random.random() > 0.7:  # Tentar apenas 30% das vezes para reduzir bloqueios
-                time.sleep(random.uniform(1.5, 3.0))
-                dados_status = self.tentar_status_invest(ticker)
-                dados.update(dados_status)
-            
-            # Calcular score mesmo com dados parciais
-            if dados.get('preco') is not None or dados.get('dy') is not None:
-                dados['score_final'] = self.calcular_score(dados)
-                dados['classificacao'] = self.classificar(dados['score_final'])
-                resultados.append(dados)
-                coletados += 1
-            
-            # Rate limiting robusto
-            if i < len(self.tickers_validos):
-                time.sleep(self.rate_limit + random.uniform(1.0, 2.5))
-        
+            log.info("  📈 %-6s coletado", ticker.replace('.SA', ''))
+            return ticker, dados
+
+        max_workers = int(os.getenv('YFINANCE_WORKERS', '10'))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            coletas = dict(executor.map(coletar, TICKERS_VALIDOS))
+
+        # Passo 2: Tentar enriquecer com Status Invest (opcional - não falha)
+        # Rotação determinística: ~1/3 dos tickers por dia, cobrindo a lista
+        # inteira a cada 3 execuções diárias - mesma carga do antigo sorteio de
+        # 30%, mas sem papéis repetidos nem esquecidos por azar
+        deslocamento = date.today().toordinal()
+        alvos = ([t for i, t in enumerate(TICKERS_VALIDOS) if (i + deslocamento) % 3 == 0]
+                 if self.status_invest_habilitado else [])
+        extras = self.enriquecer_status_invest(alvos)
+        for ticker, dados_status in extras.items():
+            coletas[ticker].update(dados_status)
+
+        # Score calculado de forma vetorizada sobre o DataFrame inteiro (mesmo com dados parciais)
+        resultados = [d for d in coletas.values()
+                      if d.get('preco') is not None or d.get('dy') is not None]
+        coletados = len(resultados)
+
         print("\n" + "="*70)
-        print(f"✅ Coletados com sucesso: {coletados}/{len(self.tickers_validos)} tickers")
+        print(f"✅ Coletados com sucesso: {coletados}/{len(TICKERS_VALIDOS)} tickers")
         print(f"💡 Dica: Status Invest bloqueia IPs de datacenter. yfinance é fonte primária confiável.")
-        return pd.DataFrame(resultados) if resultados else pd.DataFrame()
+
+        if not resultados:
+            return pd.DataFrame()
+
+        # Esquema fixo de colunas: o pandas monta cada coluna como um array só,
+        # sem inferir a união das chaves dos dicts, e o DataFrame sai com o
+        # mesmo formato mesmo quando métricas faltam em todos os papéis
+        colunas = ['ticker', *self.CAMPOS_YFINANCE, 'div_liq_ebitda']
+        return self.calcular_scores(pd.DataFrame(resultados, columns=colunas))
     
     def atualizar_sheets(self, df: pd.DataFrame) -> bool:
         """Atualiza Google Sheets com tratamento robusto de erros"""
         try:
+            # Import tardio: gspread/oauth2client só pesam quando a planilha é usada,
+            # e a coleta continua funcionando sem eles instalados
+            try:
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+            except ImportError as e:
+                print(f"❌ ERRO: dependência do Google Sheets ausente ({e.name})")
+                return False
+
             if not os.path.exists('credentials.json'):
                 print("❌ ERRO: credentials.json não encontrado")
                 return False
@@ -236,7 +732,8 @@ class ScreenerResilienteBR:
                 return False
             
             try:
-                sheet = client.open_by_key(spreadsheet_id).sheet1
+                planilha = client.open_by_key(spreadsheet_id)
+                sheet = planilha.sheet1
                 print(f"✅ Conectado à planilha: {sheet.title}")
             except gspread.exceptions.APIError as e:
                 if "403" in str(e):
@@ -245,28 +742,38 @@ class ScreenerResilienteBR:
                     return False
                 raise
             
-            # Preparar dados
+            # Preparar dados (colunas inteiras de uma vez, sem iterrows)
             headers = ['Data/Hora', 'Ticker', 'Score', 'Classificação', 'Preço (R$)', 'P/L', 'P/VP', 'DY%', 'ROE%', 'Volume']
-            dados_linhas = []
-            
-            for _, row in df.iterrows():
-                dados_linhas.append([
-                    datetime.now().strftime('%Y-%m-%d %H:%M'),
-                    row['ticker'],
-                    round(row.get('score_final', 0), 1),
-                    row.get('classificacao', ''),
-                    round(row.get('preco', 0), 2) if row.get('preco') else '',
-                    round(row.get('pl', 0), 2) if row.get('pl') else '',
-                    round(row.get('pvp', 0), 2) if row.get('pvp') else '',
-                    round(row.get('dy', 0), 2) if row.get('dy') else '',
-                    round(row.get('roe', 0), 2) if row.get('roe') else '',
-                    f"{row.get('volume', 0):,.0f}" if row.get('volume') else ''
-                ])
+
+            def coluna_numerica(nome, casas):
+                if nome not in df:
+                    return pd.Series('', index=df.index)
+                serie = pd.to_numeric(df[nome], errors='coerce').round(casas)
+                return serie.mask(serie.isna() | (serie == 0), '')
+
+            volume = pd.to_numeric(df.get('volume'), errors='coerce') if 'volume' in df else pd.Series(np.nan, index=df.index)
+            saida = pd.DataFrame({
+                'data_hora': datetime.now().strftime('%Y-%m-%d %H:%M'),
+                'ticker': df['ticker'],
+                'score': df['score_final'].round(1),
+                'classificacao': df.get('classificacao', ''),
+                'preco': coluna_numerica('preco', 2),
+                'pl': coluna_numerica('pl', 2),
+                'pvp': coluna_numerica('pvp', 2),
+                'dy': coluna_numerica('dy', 2),
+                'roe': coluna_numerica('roe', 2),
+                'volume': volume.map(lambda v: f"{v:,.0f}" if pd.notna(v) and v else ''),
+            })
+            dados_linhas = saida.values.tolist()
             
-            # Atualizar
+            # Atualizar em uma única chamada à API (evita 1 request por linha);
+            # valueInputOption=RAW dispensa o parse de valores no lado do Google
             sheet.clear()
-            sheet.append_row(headers)
-            sheet.append_rows(dados_linhas)
+            planilha.values_update(
+                f"'{sheet.title}'!A1",
+                params={'valueInputOption': 'RAW'},
+                body={'values': [headers] + dados_linhas}
+            )
             
             print(f"✅ Google Sheets ATUALIZADA com {len(df)} ações!")
             top_acao = df.nlargest(1, 'score_final').iloc[0]
@@ -284,16 +791,43 @@ class ScreenerResilienteBR:
             'data_execucao': datetime.now().isoformat(),
             'total_analisadas': len(df),
             'aprovadas': len(df[df['score_final'] >= 60]) if not df.empty else 0,
-            'acoes': df.to_dict('records')
+            # to_json do pandas é acelerado em C e já converte NaN -> null
+            'acoes': json.loads(df.to_json(orient='records')) if not df.empty else []
         }
-        
-        with open('resultados.json', 'w', encoding='utf-8') as f:
-            json.dump(resultados, f, ensure_ascii=False, indent=2)
-        
+
+        if orjson is not None:
+            with open('resultados.json', 'wb') as f:
+                f.write(orjson.dumps(resultados, option=orjson.OPT_INDENT_2))
+        else:
+            with open('resultados.json', 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, ensure_ascii=False, indent=2)
+
         print(f"💾 resultados.json salvo com {len(df)} ações")
 
+        # Histórico acumulado em Parquet particionado por dia (resultados.json guarda só a última execução)
+        try:
+            particao = pathlib.Path(os.getenv('HISTORICO_DIR', 'history')) / f"date={date.today().isoformat()}"
+            particao.mkdir(parents=True, exist_ok=True)
+            df.assign(data_execucao=pd.Timestamp.utcnow()).to_parquet(
+                particao / 'data.parquet', compression='zstd'
+            )
+            print(f"💾 Histórico Parquet atualizado em {particao}")
+        except Exception as e:
+            # Histórico é conveniência, não pré-requisito da execução
+            print(f"⚠️ Histórico Parquet não salvo: {str(e)[:60]}")
+
+    def carregar_historico(self, colunas=('ticker', 'score_final', 'data_execucao')) -> pd.DataFrame:
+        """Lê o histórico Parquet (só as colunas pedidas) para análise de tendência"""
+        caminho = pathlib.Path(os.getenv('HISTORICO_DIR', 'history'))
+        if not caminho.exists():
+            return pd.DataFrame()
+        return pd.read_parquet(caminho, columns=list(colunas))
+
 
 def main():
+    # Progresso via logging: uma escrita por registro, sem flush forçado por print
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     screener = ScreenerResilienteBR()
     df = screener.rodar_screener()
     